@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark comparing the opensearch-dsl collection path with the low-level raw-dict path.
+"""
+
+import sys
+import time
+import logging
+import argparse
+import datetime
+import urllib3
+from data_collector import collector
+from data_collector.config import Config
+from data_collector.utils import parse_timerange
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+
+def run(args, input_config, from_date, to, low_level):
+    """Runs a full collection and returns the elapsed time and number of runs"""
+    collector_instance = collector.Collector(args.es_server, args.es_index, input_config, low_level=low_level)
+    start_time = time.perf_counter()
+    data = collector_instance.collect(from_date, to)
+    return time.perf_counter() - start_time, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--es-server", action="store", help="ES Server endpoint", required=True)
+    parser.add_argument("--es-index", action="store", help="ES Index name", required=True)
+    parser.add_argument("--config", action="store", help="Configuration file", required=True)
+    parser.add_argument("--from", action="store", help="Start date, in epoch seconds", required=True, type=int,
+                        dest="from_date")
+    parser.add_argument("--to", action="store", help="End date, in epoch seconds", type=int,
+                        default=datetime.datetime.now(datetime.UTC).timestamp())
+    parser.add_argument("--rounds", action="store", help="Number of rounds per mode", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    from_date, to = parse_timerange(args.from_date, args.to)
+    input_config = Config(args.config).parse()
+
+    results = {}
+    for mode, low_level in (("dsl", False), ("low-level", True)):
+        timings = []
+        for _ in range(args.rounds):
+            elapsed, runs = run(args, input_config, from_date, to, low_level)
+            timings.append(elapsed)
+        results[mode] = min(timings)
+        print(f"{mode:>10}: best {min(timings):.3f}s, mean {sum(timings) / len(timings):.3f}s over {args.rounds} rounds, {runs} runs")
+    print(f"speedup: {results['dsl'] / results['low-level']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
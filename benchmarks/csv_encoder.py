@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark comparing CSVEncoder with csv.DictWriter, their byte-identical output is checked by tests/test_csv_encoder.py.
+"""
+
+import io
+import os
+import csv
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_collector.csv_encoder import CSVEncoder  # noqa: E402
+
+# Non-float values found in normalized rows
+OTHER_VALUES = [None, "", 0, 10 ** 20, True, False, "Green", "Yellow", "a,b", 'a"b']
+
+
+def generate_rows(rows: int, columns: int, density: float):
+    """Generates sparse normalized-like rows"""
+    random.seed(0)
+    fieldnames = [f"metric-{idx}_byLabelNamespace_ns-{idx % 7}" for idx in range(columns)]
+    data = []
+    for _ in range(rows):
+        row = {}
+        for name in fieldnames:
+            if random.random() < density:
+                row[name] = random.random() * 1000 if random.random() < 0.9 else random.choice(OTHER_VALUES)
+        data.append(row)
+    return sorted(fieldnames), data
+
+
+def dict_writer(fieldnames, rows) -> str:
+    buffer = io.StringIO(newline="")
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def csv_encoder(fieldnames, rows) -> str:
+    buffer = io.StringIO(newline="")
+    CSVEncoder(fieldnames).write(buffer, rows)
+    return buffer.getvalue()
+
+
+def timed(func, fieldnames, rows, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        func(fieldnames, rows)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", action="store", help="Number of rows", type=int, default=10000)
+    parser.add_argument("--columns", action="store", help="Number of columns", type=int, default=500)
+    parser.add_argument("--density", action="store", help="Fraction of columns set in every row", type=float, default=0.5)
+    parser.add_argument("--rounds", action="store", help="Number of rounds per writer", type=int, default=3)
+    args = parser.parse_args()
+
+    fieldnames, rows = generate_rows(args.rows, args.columns, args.density)
+    baseline = timed(dict_writer, fieldnames, rows, args.rounds)
+    encoder = timed(csv_encoder, fieldnames, rows, args.rounds)
+    print(f"{args.rows} rows x {args.columns} columns, {args.density:.0%} density")
+    print(f"csv.DictWriter: {baseline:.3f}s")
+    print(f"    CSVEncoder: {encoder:.3f}s")
+    print(f"       speedup: {baseline / encoder:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
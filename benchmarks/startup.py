@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark tracking the startup time of the console script and the import cost of every backend.
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_collector import registry  # noqa: E402
+
+
+def timed_run(cmd: list, rounds: int) -> float:
+    """Runs a command several times and returns the best wall time"""
+    timings = []
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", action="store", help="Number of rounds per measurement", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = timed_run([sys.executable, "-c", "pass"], args.rounds)
+    print(f"{'interpreter':>28}: {baseline * 1000:7.1f} ms")
+    for flag in ("--version", "--help"):
+        elapsed = timed_run([sys.executable, "main.py", flag], args.rounds)
+        print(f"{'main.py ' + flag:>28}: {elapsed * 1000:7.1f} ms")
+
+    # Import cost of every backend on top of the console script imports
+    for name, backends in (("collector", registry.COLLECTORS), ("normalizer", registry.NORMALIZERS),
+                           ("sink", registry.SINKS)):
+        for backend in backends:
+            code = f"import main; from data_collector import registry; registry.load(registry.{name.upper()}S, '{backend}')"
+            elapsed = timed_run([sys.executable, "-c", code], args.rounds)
+            print(f"{name + ' ' + backend:>28}: {elapsed * 1000:7.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Persistent cache of normalized rows, keyed by UUID, normalization config hash and code version.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+from typing import Dict, Optional
+from data_collector import __version__
+
+logger = logging.getLogger(__name__)
+
+# Configuration directives affecting the normalized row of a run
+NORMALIZATION_KEYS = [
+    "job_summary_filters",
+    "job_summary_merge",
+    "metadata",
+    "metrics",
+    "exclude_normalization",
+    "target_filters_by_data",
+    "target_field_extract_filters",
+    "target_fields_to_reduce",
+]
+
+# Modules whose changes invalidate the cached rows
+NORMALIZATION_MODULES = ["normalize.py", "utils.py", "collector.py", "profiles.py", "instance_mapper.py"]
+
+
+def code_version() -> str:
+    """Returns the package version, plus a digest of the modules producing the normalized rows"""
+    digest = hashlib.sha256()
+    for module in NORMALIZATION_MODULES:
+        with open(os.path.join(os.path.dirname(__file__), module), "rb") as f:
+            digest.update(f.read())
+    return f"{__version__}-{digest.hexdigest()[:12]}"
+
+
+def config_hash(profile: Dict, instance_dict: str = None) -> str:
+    """
+    Returns the hash of the normalization settings of a profile.
+
+    Args:
+        profile (dict): Profile configuration.
+        instance_dict (str): Optional instance dictionary file, its contents are part of the hash.
+
+    Returns:
+        Hex digest of the settings.
+    """
+    digest = hashlib.sha256(json.dumps({k: profile.get(k) for k in NORMALIZATION_KEYS}, sort_keys=True).encode("utf-8"))
+    if instance_dict:
+        with open(instance_dict, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class RowCache:
+    """SQLite backed cache of normalized rows."""
+
+    def __init__(self, path: str):
+        """
+        Init method for instance variables
+
+        Args:
+            path: Path of the SQLite database, created when it doesn't exist.
+        """
+        self.path = path
+        self.version = code_version()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            "uuid TEXT NOT NULL, config_hash TEXT NOT NULL, version TEXT NOT NULL, row TEXT NOT NULL, "
+            "PRIMARY KEY (uuid, config_hash, version))"
+        )
+        # Rows computed by other code versions can't be reused anymore
+        deleted = self.conn.execute("DELETE FROM rows WHERE version != ?", (self.version,)).rowcount
+        self.conn.commit()
+        if deleted:
+            logger.info(f"Invalidated {deleted} cached rows from previous code versions")
+
+    def get(self, uuid: str, config_hash: str) -> Optional[Dict]:
+        """Returns the cached row, an empty dict for runs filtered out, or None when not cached"""
+        result = self.conn.execute(
+            "SELECT row FROM rows WHERE uuid = ? AND config_hash = ? AND version = ?",
+            (uuid, config_hash, self.version),
+        ).fetchone()
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(result[0])
+
+    def put(self, uuid: str, config_hash: str, row: Dict) -> None:
+        """Caches the normalized row of a run"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO rows (uuid, config_hash, version, row) VALUES (?, ?, ?, ?)",
+            (uuid, config_hash, self.version, json.dumps(row, default=str)),
+        )
+
+    def close(self) -> None:
+        """Commits the cached rows and closes the database"""
+        lookups = self.hits + self.misses
+        if lookups:
+            logger.info(f"Row cache: {self.hits} hits, {self.misses} misses, "
+                        f"{100 * self.hits / lookups:.1f}% hit ratio")
+        self.conn.commit()
+        self.conn.close()
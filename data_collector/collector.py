@@ -1,41 +1,178 @@
 import logging
 import time
+import urllib3
 from opensearchpy import OpenSearch
+from opensearchpy.helpers import scan
 from opensearch_dsl import Search, Q
 from datetime import datetime
 from data_collector.instance_mapper import InstanceMapper
+from data_collector.constants import JOB_SUMMARY_MERGE_POLICIES, METRIC_PRECHECK_PAGE_SIZE
+from data_collector.serializer import get_serializer
+from data_collector.utils import compile_exclude_patterns, should_exclude, split_list_into_chunks
 
 logger = logging.getLogger(__name__)
 
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def get_client(es_server: str, low_level: bool = False) -> OpenSearch:
+    """Returns an OpenSearch client for the given endpoint"""
+    client_kwargs = {"verify_certs": False, "http_compress": True, "timeout": 30}
+    if low_level:
+        # Raw dicts are handled directly, so decoding speed matters more than AttrDict wrapping
+        client_kwargs["serializer"] = get_serializer()
+    return OpenSearch(es_server, **client_kwargs)
+
+
 class Collector:
-    def __init__(self, es_server: str, es_index: str, config: dict, instance_mapper: InstanceMapper = None):
+    def __init__(self, es_server: str, es_index: str, config: dict, instance_mapper: InstanceMapper = None,
+                 low_level: bool = False, os_client: OpenSearch = None):
         """Init method for instance variables"""
         self.config = config
         self.es_index = es_index
-        self.os_client = OpenSearch(es_server, verify_certs=False, http_compress=True, timeout=30)
+        self.low_level = low_level
+        self.os_client = os_client or get_client(es_server, low_level)
         self.instance_mapper = instance_mapper
         logging.getLogger("opensearch").setLevel(logging.WARNING)
 
     def collect(self, from_date: datetime, to: datetime):
         """Collects data from the elastic search using search_after"""
+        return list(self.iter_collect(from_date, to))
+
+    def iter_collect(self, from_date: datetime = None, to: datetime = None, uuids: list = None,
+                     runs_metadata: dict = None):
+        """
+        Collects data from the elastic search, yielding runs as soon as their metrics are fetched
+
+        The job summaries are fetched from the time range and UUIDs unless runs_metadata,
+        as returned by job_summaries, is given.
+        """
         start_time = time.time()
-        data = []
-        from_timestamp = from_date.strftime("%Y-%m-%dT%H:%M:%SZ")
-        to_timestamp = to.strftime("%Y-%m-%dT%H:%M:%SZ")
+        total_hits = 0
+        profiles = {profile["name"]: profile for profile in self._profiles()}
+        # Alerts of runs whose profiles all exclude them from normalization are only needed for the cluster health
+        alerts_summarized = {
+            name: should_exclude("alert", compile_exclude_patterns(",".join(profile.get("exclude_normalization", []))))
+            for name, profile in profiles.items()
+        }
+        if runs_metadata is None:
+            runs_metadata = self.job_summaries(from_date, to, uuids)
+        run_uuids = []
+        for uuid, profiles_metadata in runs_metadata.items():
+            if not profiles_metadata:
+                logger.debug(f"UUID {uuid} doesn't match any profile, skipping.")
+                continue
+            run_uuids.append(uuid)
+
+        incomplete = 0
+        try:
+            for page in split_list_into_chunks(run_uuids, METRIC_PRECHECK_PAGE_SIZE):
+                metric_names = []
+                for uuid in page:
+                    for name in runs_metadata[uuid]:
+                        metric_names.extend(m for m in profiles[name].get("metrics", []) if m not in metric_names)
+                try:
+                    # Runs of profiles without metrics are complete, there's nothing to check
+                    summaries = self._metric_summaries(page, metric_names) if metric_names else {}
+                except Exception as e:
+                    logger.warning(f"Search failed: {e}, continuing with partial results.")
+                    return
+
+                for uuid in page:
+                    logger.debug(f"Processing UUID: {uuid}")
+                    present, severities = summaries.get(uuid, (set(), {}))
+                    complete = [name for name in runs_metadata[uuid]
+                                if all(metric in present for metric in profiles[name].get("metrics", []))]
+                    if not complete:
+                        logger.debug(f"No verified metrics for UUID {uuid}, skipping.")
+                        incomplete += 1
+                        continue
+                    scan_names = []
+                    for name in complete:
+                        scan_names.extend(m for m in profiles[name].get("metrics", []) if m not in scan_names)
+                    summarize_alerts = "alert" in scan_names and all(alerts_summarized[name] for name in complete)
+                    if summarize_alerts:
+                        scan_names.remove("alert")
+
+                    try:
+                        metrics, _ = self._metrics_by_uuid(uuid, scan_names) if scan_names else ({}, True)
+                    except Exception as e:
+                        logger.warning(f"Search failed: {e}, continuing with partial results.")
+                        return
 
+                    verified = {}
+                    for name in complete:
+                        metadata = runs_metadata[uuid][name]
+                        if not all(metric in metrics or (metric == "alert" and summarize_alerts)
+                                   for metric in profiles[name].get("metrics", [])):
+                            logger.debug(f"No verified metrics for UUID {uuid} in profile {name}, skipping.")
+                            continue
+                        if self.instance_mapper:
+                            instance_specs = self.instance_mapper.map_instance_types_from_metadata(metadata)
+                            metadata.update(instance_specs)
+                        verified[name] = metadata
+                    if not verified:
+                        logger.debug(f"No verified metrics for UUID {uuid}, skipping.")
+                        continue
+
+                    total_hits += 1
+                    if "profiles" in self.config:
+                        run = {"metrics": metrics, "profiles": verified}
+                        # Matching profiles missing metrics, which may still be indexed later
+                        incomplete_profiles = [name for name in runs_metadata[uuid] if name not in verified]
+                        if incomplete_profiles:
+                            run["incompleteProfiles"] = incomplete_profiles
+                    else:
+                        run = {"metadata": verified[None], "metrics": metrics}
+                    if summarize_alerts:
+                        run["alertSeverities"] = severities
+                    yield {uuid: run}
+        finally:
+            elapsed = time.time() - start_time
+            if incomplete:
+                logger.info(f"Skipped {incomplete} runs with missing metrics without scanning them")
+            logger.info(f"Data collection completed in {elapsed:.2f} seconds. Retrieved {total_hits} documents.")
+
+    def _profiles(self) -> list:
+        """Returns the profiles served by the collection, a single unnamed one when no profiles are configured"""
+        if "profiles" in self.config:
+            return self.config["profiles"]
+        return [dict(self.config, name=None)]
+
+    def job_summaries(self, from_date: datetime = None, to: datetime = None, uuids: list = None) -> dict:
+        """Fetches the jobSummary documents in the time range, returning the merged metadata of every UUID by profile"""
+        runs_metadata = {}
+        job_names = {}
+        duplicates = 0
+        profiles = self._profiles()
+        for profile in profiles:
+            merge_policy = profile.get("job_summary_merge", "first")
+            if merge_policy not in JOB_SUMMARY_MERGE_POLICIES:
+                raise ValueError(f"Invalid job_summary_merge policy '{merge_policy}', "
+                                 f"valid values are: {', '.join(JOB_SUMMARY_MERGE_POLICIES)}")
         logger.info(f"Elasticsearch index: {self.es_index}")
-        must = [
-            Q("range", **{"timestamp": {"gte": from_timestamp, "lte": to_timestamp}})
-        ]
-        for k, v in self.config.get("job_summary_filters", {}).items():
-            must.append(Q("term", **{k: v}))
-        query = Q("bool", must=must)
+        must = []
+        if from_date and to:
+            from_timestamp = from_date.strftime("%Y-%m-%dT%H:%M:%SZ")
+            to_timestamp = to.strftime("%Y-%m-%dT%H:%M:%SZ")
+            must.append(Q("range", **{"timestamp": {"gte": from_timestamp, "lte": to_timestamp}}))
+        if uuids:
+            must.append(Q("terms", **{"uuid.keyword": uuids}))
+        filter_sets = [profile.get("job_summary_filters") or {} for profile in profiles]
+        if len(filter_sets) == 1:
+            for k, v in filter_sets[0].items():
+                must.append(Q("term", **{k: v}))
+            query = Q("bool", must=must)
+        elif all(filter_sets):
+            # A jobSummary is fetched when it matches the filters of any profile
+            should = [Q("bool", must=[Q("term", **{k: v}) for k, v in filters.items()]) for filters in filter_sets]
+            query = Q("bool", must=must, should=should, minimum_should_match=1)
+        else:
+            query = Q("bool", must=must)
         logger.info(f"Fetching kube-burner job summaries using query: {query.to_dict()}")
 
         page_size = 100
         sort_field = "timestamp"
         search_after = None
-        total_hits = 0
 
         while True:
             s = (
@@ -50,70 +187,152 @@ class Collector:
                 s = s.extra(search_after=search_after)
 
             try:
-                response = s.execute()
-                hits = response.hits
+                hits = self._search(s)
 
                 if not hits:
                     break
-                for hit in hits:
-                    run_data = {}
-                    jobSummary = hit.to_dict()
+                for jobSummary, _ in hits:
                     uuid = jobSummary.get("uuid")
 
                     if not uuid:
                         logger.warning("Missing UUID in jobSummary, skipping entry.")
                         continue
 
-                    logger.debug(f"Processing UUID: {uuid}")
-
-                    if uuid not in run_data:
-                        logger.debug("UUID not present in run data, adding it")
-                        run_data[uuid] = {"metadata": {}, "metrics": {}}
-
-                    for field in self.config["metadata"]:
-                        if field in jobSummary:
-                            run_data[uuid]["metadata"][field] = jobSummary[field]
-                        elif "jobConfig" in jobSummary and field in jobSummary["jobConfig"]:
-                            run_data[uuid]["metadata"].setdefault("jobConfig", {})[field] = jobSummary["jobConfig"][field]
+                    if uuid in runs_metadata:
+                        duplicates += 1
+                    run_profiles = runs_metadata.setdefault(uuid, {})
+                    job_name = jobSummary.get("jobConfig", {}).get("name")
+                    for profile in profiles:
+                        if len(profiles) > 1 and not self._matches(jobSummary, profile.get("job_summary_filters") or {}):
+                            continue
+                        name = profile["name"]
+                        metadata = self._metadata(jobSummary, profile["metadata"])
+                        if name not in run_profiles:
+                            logger.debug(f"UUID {uuid} not present in run data, adding it")
+                            run_profiles[name] = metadata
+                            job_names[(uuid, name)] = {job_name}
+                            continue
 
-                    if self.instance_mapper:
-                        instance_specs = self.instance_mapper.map_instance_types_from_metadata(run_data[uuid]["metadata"])
-                        run_data[uuid]["metadata"].update(instance_specs)
-
-                    metrics, count_verified = self._metrics_by_uuid(uuid)
-                    if count_verified:
-                        run_data[uuid]["metrics"] = metrics
-                    else:
-                        logger.debug(f"No verified metrics for UUID {uuid}, skipping.")
-                        continue
-
-                    data.append(run_data)
-                    total_hits += 1
+                        merge_policy = profile.get("job_summary_merge", "first")
+                        logger.debug(f"Found duplicate jobSummary for UUID {uuid}, applying merge policy '{merge_policy}'")
+                        if merge_policy == "last":
+                            run_profiles[name] = metadata
+                        elif merge_policy == "merge" and job_name not in job_names[(uuid, name)]:
+                            job_names[(uuid, name)].add(job_name)
+                            self._merge_metadata(run_profiles[name], metadata)
 
                 # Prepare for next page
-                search_after = hits[-1].meta.sort
+                search_after = hits[-1][1]
 
             except Exception as e:
                 logger.warning(f"Search failed: {e}, continuing with partial results.")
                 break
 
-        elapsed = time.time() - start_time
-        logger.info(f"Data collection completed in {elapsed:.2f} seconds. Retrieved {total_hits} documents.")
-        return data
+        if duplicates:
+            logger.info(f"Deduplicated {duplicates} jobSummary documents across {len(runs_metadata)} UUIDs, "
+                        f"avoided {duplicates} redundant metric fetches")
+        return runs_metadata
 
-    def _metrics_by_uuid(self, uuid: str):
+    @staticmethod
+    def _matches(jobSummary: dict, filters: dict) -> bool:
+        """Checks whether a jobSummary matches the given term filters"""
+        for field, expected in filters.items():
+            value = jobSummary
+            for key in field.removesuffix(".keyword").split("."):
+                value = value.get(key) if isinstance(value, dict) else None
+            if value != expected:
+                return False
+        return True
+
+    @staticmethod
+    def _metadata(jobSummary: dict, fields: list) -> dict:
+        """Extracts the given metadata fields from a jobSummary"""
+        metadata = {}
+        for field in fields:
+            if field in jobSummary:
+                metadata[field] = jobSummary[field]
+            elif "jobConfig" in jobSummary and field in jobSummary["jobConfig"]:
+                metadata.setdefault("jobConfig", {})[field] = jobSummary["jobConfig"][field]
+        return metadata
+
+    @staticmethod
+    def _merge_metadata(metadata: dict, other: dict) -> None:
+        """Merges the metadata of another job of the same UUID, existing values take precedence"""
+        for field, value in other.items():
+            if field == "jobConfig":
+                for k, v in value.items():
+                    metadata.setdefault("jobConfig", {}).setdefault(k, v)
+            elif field == "passed" and "passed" in metadata:
+                # A run is only considered passed when all of its jobs passed
+                metadata["passed"] = metadata["passed"] and value
+            else:
+                metadata.setdefault(field, value)
+
+    def _metrics_by_uuid(self, uuid: str, input_list: list = None):
         """Collects the list of metrics for an uuid"""
         metrics = {}
-        input_list = self.config.get("metrics", {})
-        metric_filter = [Q("term", **{"metricName.keyword": metric}) for metric in input_list]
-        should_query = Q("bool", should=metric_filter)
-        query = Q("bool", must_not=[Q("term", **{"jobConfig.name.keyword": "garbage-collection"})], should=should_query)
-        s = Search(using=self.os_client, index=self.es_index).filter("term", **{"uuid.keyword": uuid}).query(query)
+        if input_list is None:
+            input_list = self.config.get("metrics", [])
+        s = Search(using=self.os_client, index=self.es_index).filter("term", **{"uuid.keyword": uuid})
+        s = s.query(self._metrics_query(input_list))
         logger.debug(f"Running query: {s.to_dict()}")
-        for hit in s.scan():
-            datapoint = hit.to_dict()
+        for datapoint in self._scan(s):
             if datapoint["metricName"] not in metrics:
                 metrics[datapoint["metricName"]] = [datapoint]
             else:
                 metrics[datapoint["metricName"]].append(datapoint)
         return metrics, len(metrics) == len(input_list)
+
+    def _metric_summaries(self, uuids: list, input_list: list) -> dict:
+        """
+        Summarizes the metrics of a page of UUIDs with a single aggregation, without fetching any datapoint.
+
+        Args:
+            uuids (list): UUIDs of the runs.
+            input_list (list): Metric names to look for.
+
+        Returns:
+            Dict of UUID to a tuple of the metric names found and the number of alerts by severity.
+        """
+        s = Search(using=self.os_client, index=self.es_index).filter("terms", **{"uuid.keyword": uuids})
+        s = s.query(self._metrics_query(input_list)).extra(size=0)
+        by_uuid = s.aggs.bucket("by_uuid", "terms", field="uuid.keyword", size=len(uuids))
+        by_uuid.bucket("metrics", "terms", field="metricName.keyword", size=len(input_list), include=input_list)
+        by_uuid.bucket("alerts", "filter", Q("term", **{"metricName.keyword": "alert"})) \
+            .bucket("severities", "terms", field="severity.keyword")
+        logger.debug(f"Running query: {s.to_dict()}")
+        summaries = {}
+        for bucket in self._aggregate(s)["by_uuid"]["buckets"]:
+            present = {metric["key"] for metric in bucket["metrics"]["buckets"]}
+            severities = {severity["key"]: severity["doc_count"] for severity in bucket["alerts"]["severities"]["buckets"]}
+            summaries[bucket["key"]] = (present, severities)
+        return summaries
+
+    @staticmethod
+    def _metrics_query(input_list: list) -> Q:
+        """Returns the query matching the datapoints of the given metrics, garbage collection ones excluded"""
+        metric_filter = [Q("term", **{"metricName.keyword": metric}) for metric in input_list]
+        should_query = Q("bool", should=metric_filter)
+        return Q("bool", must_not=[Q("term", **{"jobConfig.name.keyword": "garbage-collection"})], should=should_query)
+
+    def _aggregate(self, s: Search) -> dict:
+        """Runs an aggregation request and returns the raw aggregations"""
+        if self.low_level:
+            return self.os_client.search(index=self.es_index, body=s.to_dict())["aggregations"]
+        return s.execute().aggregations.to_dict()
+
+    def _search(self, s: Search) -> list:
+        """Runs a search request and returns a list of (source, sort values) tuples"""
+        if self.low_level:
+            response = self.os_client.search(index=self.es_index, body=s.to_dict())
+            return [(hit["_source"], hit.get("sort")) for hit in response["hits"]["hits"]]
+        return [(hit.to_dict(), list(hit.meta.sort)) for hit in s.execute().hits]
+
+    def _scan(self, s: Search):
+        """Scrolls over all the documents matching a search, yielding their source"""
+        if self.low_level:
+            for hit in scan(self.os_client, query=s.to_dict(), index=self.es_index):
+                yield hit["_source"]
+        else:
+            for hit in s.scan():
+                yield hit.to_dict()
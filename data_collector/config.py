@@ -1,4 +1,5 @@
 import yaml
+from typing import Dict, List
 
 
 class Config:
@@ -10,3 +11,31 @@ class Config:
         """loads the YAML file for parsing"""
         with open(self.config_file) as f:
             return yaml.safe_load(f)
+
+
+def resolve_sources(es_servers: List[str], es_indices: List[str], config: dict) -> List[Dict[str, str]]:
+    """
+    Builds the list of sources to collect from.
+
+    Sources given in the command line take precedence over the ones in the configuration file.
+    Every server given in the command line is queried with all the given indices, each pair being a source.
+
+    Args:
+        es_servers (list): ES Server endpoints given in the command line.
+        es_indices (list): ES Index names given in the command line.
+        config (dict): Parsed configuration, optionally containing a `sources` list.
+
+    Returns:
+        List of sources, as dicts with `es_server` and `es_index` keys.
+    """
+    if es_servers or es_indices:
+        if not es_servers or not es_indices:
+            raise ValueError("Both --es-server and --es-index must be given")
+        return [{"es_server": es_server, "es_index": es_index} for es_server in es_servers for es_index in es_indices]
+    sources = config.get("sources", [])
+    if not sources:
+        raise ValueError("No sources configured, use --es-server/--es-index or the sources directive")
+    for source in sources:
+        if not source.get("es_server") or not source.get("es_index"):
+            raise ValueError(f"Invalid source {source}, es_server and es_index are required")
+    return sources
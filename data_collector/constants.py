@@ -1 +1,5 @@
-VALID_LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
\ No newline at end of file
+VALID_LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+JOB_SUMMARY_MERGE_POLICIES = ["first", "last", "merge"]
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+# Number of runs whose metrics are checked with a single aggregation before scanning them
+METRIC_PRECHECK_PAGE_SIZE = 100
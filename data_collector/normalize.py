@@ -1,7 +1,5 @@
 import re
 import logging
-import numpy as np
-import pandas as pd
 from typing import Dict, List
 from data_collector.utils import (
     strhash,
@@ -17,6 +15,51 @@ logger = logging.getLogger(__name__)
 DROP_LIST = ['metadata','uuid','metricName','labels','query', 'value', 'jobName', 'timestamp']
 NEST_ORDER = ["mode", "scope", "verb", "namespace", "component", "resource", "container", "endpoint"]
 DEFAULT_HASH = "xyz"
+LABEL_CACHE_SIZE = 100000
+
+
+class LabelIndex:
+    """Interns label sets into canonical keys, caching their NEST_ORDER projection and byLabel path"""
+
+    def __init__(self, nest_order: List[str], max_size: int = LABEL_CACHE_SIZE):
+        """Init method for instance variables"""
+        self.nest_order = nest_order
+        self.max_size = max_size
+        self._projections = {}
+        self._paths = {}
+
+    def key(self, labels: dict):
+        """Returns the canonical key of a label set, equal for equal label sets regardless of key order"""
+        try:
+            return frozenset(labels.items())
+        except TypeError:
+            # Unhashable label values, fall back to the recursive string hash
+            return strhash(labels)
+
+    def projection(self, key, labels: dict) -> dict:
+        """Returns the labels of a label set that are used for nesting, in NEST_ORDER"""
+        projection = self._projections.get(key)
+        if projection is None:
+            if len(self._projections) >= self.max_size:
+                self._projections.clear()
+            projection = {k: labels[k] for k in self.nest_order if k in labels}
+            self._projections[key] = projection
+        return projection
+
+    def path(self, labels: dict) -> tuple:
+        """Returns the (byLabelX, value) nesting path of a label set"""
+        key = self.key(labels)
+        path = self._paths.get(key)
+        if path is None:
+            if len(self._paths) >= self.max_size:
+                self._paths.clear()
+            path = tuple((f"byLabel{k.capitalize()}", labels[k]) for k in self.nest_order if k in labels)
+            self._paths[key] = path
+        return path
+
+
+# Shared across runs, label sets tend to repeat from one run to the next
+LABEL_INDEX = LabelIndex(NEST_ORDER)
 
 
 def process_json(metric: str, entries: dict, skip_patterns: List[re.Pattern], output: Dict) -> None:
@@ -43,12 +86,12 @@ def process_json(metric: str, entries: dict, skip_patterns: List[re.Pattern], ou
         label_hash = DEFAULT_HASH
         labels = entry.get("labels")
         if labels:
-            label_hash = strhash(labels)
+            label_hash = LABEL_INDEX.key(labels)
 
         if label_hash not in grouped_metrics:
             grouped_metrics[label_hash] = {"value": 0.0}
             if labels:
-                grouped_metrics[label_hash]["labels"] = {k: labels[k] for k in NEST_ORDER if k in labels}
+                grouped_metrics[label_hash]["labels"] = LABEL_INDEX.projection(label_hash, labels)
 
         # Drop unneeded fields
         if "value" in entry:
@@ -86,9 +129,9 @@ def normalize_metrics(metrics: dict) -> dict:
             labels = entry.get("labels", {})
             value = entry["value"]
 
-            # Get available keys from labels, in nest_order
-            label_keys = [k for k in NEST_ORDER if k in labels]
-            if not label_keys:
+            # Get available (byLabelX, value) pairs from labels, in nest_order
+            label_path = LABEL_INDEX.path(labels) if labels else ()
+            if not label_path:
                 # No labels at all, store directly under metric
                 existing = nested_metrics[metric]
                 if isinstance(existing, (int, float)):
@@ -103,10 +146,8 @@ def normalize_metrics(metrics: dict) -> dict:
                 continue
 
             curr = nested_metrics[metric]
-            for _, key in enumerate(label_keys):
+            for group_key, key_value in label_path:
                 # logc to generate nested keys with labels
-                key_value = labels[key]
-                group_key = f"byLabel{key.capitalize()}"
                 curr = curr.setdefault(group_key, {})
                 if key_value in curr:
                     if isinstance(curr[key_value], (int, float)):
@@ -189,6 +230,9 @@ def normalize(metrics_data, data_filters, extract_filters, fields_to_reduce: dic
 
     # Reduce multiple fields into one target (based on regex)
     if fields_to_reduce:
+        # pandas and numpy are only needed here, import them lazily to keep startup fast
+        import numpy as np
+        import pandas as pd
         for field in fields_to_reduce:
             key, target_key = list(field.items())[0]
 
@@ -217,6 +261,10 @@ def normalize(metrics_data, data_filters, extract_filters, fields_to_reduce: dic
                 if k != target_key:  # avoid removing the reduced one
                     flattened.pop(k, None)
 
-    alerts = metrics_data["metrics"]["alert"] if 'alert' in metrics_data["metrics"] else []
+    if "alertSeverities" in metrics_data:
+        # Alerts summarized by the collector, only their severities are known
+        alerts = [{"severity": severity} for severity in metrics_data["alertSeverities"]]
+    else:
+        alerts = metrics_data["metrics"]["alert"] if 'alert' in metrics_data["metrics"] else []
     flattened["cluster_health_score"] = get_cluster_health(alerts, metadata["passed"])
     return flattened
@@ -1,12 +1,13 @@
 import os
-import csv
-import boto3
+import json
 import logging
 import tempfile
+from data_collector.csv_encoder import CSVEncoder, open_csv
 
 logger = logging.getLogger(__name__)
 
-def upload_csv_to_s3(chunk_rows: list, fieldnames: list, bucket: str, foldername: str, filename: str):
+def upload_csv_to_s3(chunk_rows: list, fieldnames: list, bucket: str, foldername: str, filename: str,
+                     compression: str = None):
     """
     Uploads a CSV file to Amazon S3.
     
@@ -16,25 +17,25 @@ def upload_csv_to_s3(chunk_rows: list, fieldnames: list, bucket: str, foldername
         bucket (str): Name of the S3 bucket to upload to.
         foldername (str): S3 folder/prefix path where the file will be stored.
         filename (str): Name of the file to create in S3.
+        compression (str): Optional compression of the file, gzip or zstd.
     """
-    tmp = tempfile.NamedTemporaryFile(mode='w+', newline='', delete=False)
+    tmp = tempfile.NamedTemporaryFile(delete=False)
+    tmp.close()
     try:
-        writer = csv.DictWriter(tmp, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(chunk_rows)
-        tmp.flush()
+        with open_csv(tmp.name, compression) as f:
+            CSVEncoder(fieldnames).write(f, chunk_rows)
 
-        # Upload to S3
+        # Upload to S3, boto3 is imported lazily as it's slow to import
+        import boto3
         s3 = boto3.client("s3")
         s3_key = f"{foldername.rstrip('/')}/{filename}"
         s3.upload_file(tmp.name, bucket, s3_key)
         logger.info(f"✅ Uploaded chunk to s3://{bucket}/{s3_key}")
     finally:
-        tmp.close()
         os.remove(tmp.name)
         logger.info(f"🧹 Temporary file {tmp.name} deleted")
 
-def write_to_file(chunk_rows: list, fieldnames: list, filename: str):
+def write_to_file(chunk_rows: list, fieldnames: list, filename: str, compression: str = None):
     """
     Writes csv into file
     
@@ -44,9 +45,39 @@ def write_to_file(chunk_rows: list, fieldnames: list, filename: str):
         chunk_rows (list): The list of rows to write to file.
         fieldnames (list): The list of field names to write to file.
         filename (str): Path and name of the output CSV file.
+        compression (str): Optional compression of the file, gzip or zstd.
+    """
+    if os.path.dirname(filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open_csv(filename, compression) as f:
+        CSVEncoder(fieldnames).write(f, chunk_rows)
+    logger.info(f"✅ Output written in file {filename}")
+
+def upload_manifest_to_s3(manifest: dict, bucket: str, foldername: str, filename: str):
+    """
+    Uploads a partitions manifest to Amazon S3.
+
+    Args:
+        manifest (dict): Manifest listing the written partitions.
+        bucket (str): Name of the S3 bucket to upload to.
+        foldername (str): S3 folder/prefix path where the manifest will be stored.
+        filename (str): Name of the manifest file to create in S3.
+    """
+    import boto3
+    s3 = boto3.client("s3")
+    s3_key = f"{foldername.rstrip('/')}/{filename}"
+    s3.put_object(Bucket=bucket, Key=s3_key, Body=json.dumps(manifest, indent=2).encode("utf-8"),
+                  ContentType="application/json")
+    logger.info(f"✅ Uploaded manifest to s3://{bucket}/{s3_key}")
+
+def write_manifest(manifest: dict, filename: str):
+    """
+    Writes a partitions manifest into file
+
+    Args:
+        manifest (dict): Manifest listing the written partitions.
+        filename (str): Path and name of the manifest file.
     """
     with open(filename, "w") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(chunk_rows)
-    logger.info(f"✅ Output written in file {filename}")
\ No newline at end of file
+        json.dump(manifest, f, indent=2)
+    logger.info(f"✅ Manifest written in file {filename}")
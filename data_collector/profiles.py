@@ -0,0 +1,117 @@
+"""
+Multi-profile support, serving several configuration files with a single collection pass.
+"""
+
+import os
+import logging
+from typing import Dict, List
+from data_collector import registry
+from data_collector.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def load_profiles(config_files: List[str]) -> List[Dict]:
+    """
+    Loads every configuration file as a profile.
+
+    Profiles are named after the configuration file name, without extension. Profiles sharing the
+    same output_prefix would overwrite each other's files, so the profile name is appended to it.
+
+    Args:
+        config_files (list): Paths of the configuration files.
+
+    Returns:
+        List of profiles, each one being the parsed configuration plus a `name` key.
+    """
+    profiles = []
+    names = set()
+    for config_file in config_files:
+        profile = Config(config_file).parse()
+        name = os.path.splitext(os.path.basename(config_file))[0]
+        if name in names:
+            name = f"{name}-{len(profiles)}"
+        names.add(name)
+        profile["name"] = name
+        logger.debug(f"Loaded profile {name} from {config_file}")
+        profiles.append(profile)
+
+    # Only the prefix is compared, with --output file every profile writes to the current directory whatever its S3 location
+    prefixes = {}
+    for profile in profiles:
+        if profile.get("output_prefix"):
+            prefixes.setdefault(profile["output_prefix"], []).append(profile)
+    for prefix, colliding in prefixes.items():
+        if len(colliding) < 2:
+            continue
+        for profile in colliding:
+            profile["output_prefix"] = f"{prefix}_{profile['name']}"
+        logger.warning(f"Profiles {', '.join(p['name'] for p in colliding)} share the output prefix {prefix}, "
+                       f"writing them as {', '.join(p['output_prefix'] for p in colliding)}")
+    return profiles
+
+
+def merge_profiles(profiles: List[Dict]) -> Dict:
+    """
+    Builds the configuration of a collection pass serving all the given profiles.
+
+    The metadata fields, metrics and sources are the union of the ones of every profile,
+    while the job summary filters of each profile are kept in the profiles list.
+
+    Args:
+        profiles (list): Profiles as returned by load_profiles.
+
+    Returns:
+        Collection configuration.
+    """
+    merged = {"metadata": [], "metrics": [], "profiles": profiles}
+    sources = []
+    for profile in profiles:
+        for key in ("metadata", "metrics"):
+            merged[key].extend(v for v in profile.get(key, []) if v not in merged[key])
+        sources.extend(s for s in profile.get("sources", []) if s not in sources)
+    if sources:
+        merged["sources"] = sources
+    return merged
+
+
+def route_run(run_json: Dict, profile: Dict) -> Dict:
+    """
+    Builds the view of a collected run for the given profile.
+
+    Args:
+        run_json (dict): Collected run, with the metadata of every matching profile under `profiles`.
+        profile (dict): Profile the run is routed to.
+
+    Returns:
+        Run with the profile metadata, only the profile metrics and the alert severities summary, if any.
+    """
+    metrics = {}
+    for metric in profile.get("metrics", []):
+        if metric in run_json["metrics"]:
+            # Normalization mutates the datapoints, so every profile gets its own copy
+            metrics[metric] = [dict(datapoint) for datapoint in run_json["metrics"][metric]]
+    routed = {"metadata": run_json["profiles"][profile["name"]], "metrics": metrics}
+    # Like alert documents, the summary only goes to profiles collecting alerts
+    if "alertSeverities" in run_json and "alert" in profile.get("metrics", []):
+        routed["alertSeverities"] = run_json["alertSeverities"]
+    return routed
+
+
+def normalize_run(run_json: Dict, profile: Dict) -> Dict:
+    """
+    Normalizes a collected run with the settings of the given profile.
+
+    Args:
+        run_json (dict): Collected run, routed to the profile.
+        profile (dict): Profile to normalize the run for.
+
+    Returns:
+        Normalized row, empty when the run is filtered out.
+    """
+    normalize = registry.load(registry.NORMALIZERS, "default")
+    return normalize(route_run(run_json, profile),
+                     profile.get('target_filters_by_data', []),
+                     profile.get("target_field_extract_filters", []),
+                     profile.get("target_fields_to_reduce", []),
+                     ",".join(profile["exclude_normalization"]))
@@ -0,0 +1,44 @@
+"""
+Registry of the collector, normalizer and sink backends.
+
+Backends are referenced as "module:attribute" strings and only imported when selected,
+so that commands not needing them don't pay for heavy imports like pandas, boto3 or opensearch-py.
+"""
+
+from importlib import import_module
+from typing import Any, Dict
+
+COLLECTORS = {
+    "opensearch": "data_collector.sources:collect_sources",
+}
+
+NORMALIZERS = {
+    "default": "data_collector.normalize:normalize",
+}
+
+SINKS = {
+    "s3": "data_collector.output:upload_csv_to_s3",
+    "file": "data_collector.output:write_to_file",
+}
+
+MANIFEST_SINKS = {
+    "s3": "data_collector.output:upload_manifest_to_s3",
+    "file": "data_collector.output:write_manifest",
+}
+
+
+def load(backends: Dict[str, str], name: str) -> Any:
+    """
+    Imports and returns a backend by name.
+
+    Args:
+        backends (dict): One of the backend registries.
+        name (str): Name of the backend to load.
+
+    Returns:
+        The backend object.
+    """
+    if name not in backends:
+        raise ValueError(f"Unknown backend '{name}', valid values are: {', '.join(backends)}")
+    module_name, attr = backends[name].split(":")
+    return getattr(import_module(module_name), attr)
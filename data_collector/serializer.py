@@ -0,0 +1,40 @@
+"""orjson based serializer for the OpenSearch transport."""
+
+import logging
+from typing import Any
+from opensearchpy.exceptions import SerializationError
+from opensearchpy.serializer import JSONSerializer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class ORJSONSerializer(JSONSerializer):
+    """Drop-in replacement for JSONSerializer, encoding and decoding with orjson"""
+
+    def loads(self, s: str) -> Any:
+        try:
+            return orjson.loads(s)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data: Any) -> Any:
+        # don't serialize strings
+        if isinstance(data, (str, bytes)):
+            return data
+        try:
+            return orjson.dumps(data, default=self.default)
+        except (ValueError, TypeError) as e:
+            raise SerializationError(data, e)
+
+
+def get_serializer() -> JSONSerializer:
+    """Returns the fastest JSON serializer available"""
+    if orjson is None:
+        logger.warning("orjson is not installed, falling back to the standard JSON serializer")
+        return JSONSerializer()
+    return ORJSONSerializer()
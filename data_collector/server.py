@@ -0,0 +1,210 @@
+"""
+Long-running HTTP service serving normalized rows, keeping clients, configuration and normalized runs warm.
+"""
+
+import os
+import json
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+from data_collector.config import resolve_sources
+from data_collector.constants import VALID_LOG_LEVELS
+from data_collector.csv_encoder import CSVEncoder
+from data_collector.instance_mapper import InstanceMapper
+from data_collector.logging import configure_logging
+from data_collector.profiles import load_profiles, merge_profiles, normalize_run
+from data_collector.sources import build_collectors, stream_runs
+from data_collector.utils import parse_timerange
+
+logger = logging.getLogger(__name__)
+
+
+class RunCache:
+    """Thread-safe LRU cache of normalized rows, keyed by profile and UUID."""
+
+    def __init__(self, max_size: int):
+        """Init method for instance variables"""
+        self.max_size = max_size
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, profile: str, uuid: str) -> Optional[Dict]:
+        """Returns the cached row, an empty dict for runs filtered out, or None when not cached"""
+        with self._lock:
+            row = self._rows.get((profile, uuid))
+            if row is not None:
+                self._rows.move_to_end((profile, uuid))
+            return row
+
+    def put(self, profile: str, uuid: str, row: Dict) -> None:
+        """Caches a normalized row, evicting the least recently used ones"""
+        with self._lock:
+            self._rows[(profile, uuid)] = row
+            self._rows.move_to_end((profile, uuid))
+            while len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+
+
+class DataCollectorService:
+    """Serves normalized rows, fetching from OpenSearch only the runs that are not cached."""
+
+    def __init__(self, sources: List[Dict[str, str]], profiles: List[Dict], instance_mapper: InstanceMapper = None,
+                 low_level: bool = False, cache_size: int = 1000):
+        """Init method for instance variables"""
+        self.sources = sources
+        self.profiles = {profile["name"]: profile for profile in profiles}
+        self.collectors = build_collectors(sources, merge_profiles(profiles), instance_mapper, low_level)
+        self.cache = RunCache(cache_size)
+
+    def profile(self, name: Optional[str]) -> Dict:
+        """Returns a profile by name, the name can be omitted when there's a single one"""
+        if name is None and len(self.profiles) == 1:
+            return next(iter(self.profiles.values()))
+        if name not in self.profiles:
+            raise KeyError(f"Unknown profile '{name}', valid values are: {', '.join(self.profiles)}")
+        return self.profiles[name]
+
+    def rows(self, profile: Dict, uuids: List[str] = None, from_date=None, to=None) -> Iterator[Dict]:
+        """Yields the normalized rows of the given runs or time range, cached ones first, fetching the rest from OpenSearch"""
+        cached = []
+
+        def select(run_uuids: List[str]) -> List[str]:
+            missing = []
+            for uuid in run_uuids:
+                row = self.cache.get(profile["name"], uuid)
+                if row is None:
+                    missing.append(uuid)
+                elif row:
+                    cached.append(row)
+            logger.info(f"Serving {len(run_uuids)} runs for profile {profile['name']}: "
+                        f"{len(run_uuids) - len(missing)} cached, {len(missing)} to fetch")
+            return missing
+
+        if uuids is not None:
+            missing = select(uuids)
+            yield from cached
+            if not missing:
+                return
+            cached.clear()
+            runs = stream_runs(self.sources, self.collectors, uuids=missing)
+        else:
+            # The runs in the time range are listed by the sources, and only the uncached ones collected
+            runs = stream_runs(self.sources, self.collectors, from_date, to, select=select)
+        for run_data in runs:
+            yield from cached
+            cached.clear()
+            for uuid, run_json in run_data.items():
+                # Every profile matching the run is warmed up, not only the requested one
+                for name in self.profiles:
+                    row = normalize_run(run_json, self.profiles[name]) if name in run_json["profiles"] else {}
+                    if row:
+                        row = dict(row, uuid=uuid)
+                    # Runs missing metrics of the profile are fetched again by the next requests
+                    if name not in run_json.get("incompleteProfiles", []):
+                        self.cache.put(name, uuid, row)
+                    if name == profile["name"] and row:
+                        yield row
+        yield from cached
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Handles the HTTP requests of the service."""
+
+    service: DataCollectorService = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == "/health":
+            return self._send_message(200, "OK")
+        if url.path != "/rows":
+            return self._send_message(404, f"Unknown path {url.path}")
+        output_format = params.get("format", "jsonl")
+        if output_format not in ("csv", "jsonl"):
+            return self._send_message(400, f"Invalid format '{output_format}', valid values are: csv, jsonl")
+        try:
+            profile = self.service.profile(params.get("config"))
+        except KeyError as e:
+            return self._send_message(404, str(e.args[0]))
+        if "uuids" in params:
+            rows = self.service.rows(profile, [uuid for uuid in params["uuids"].split(",") if uuid])
+        elif "from" in params:
+            try:
+                from_date, to = parse_timerange(int(params["from"]), int(params["to"]))
+            except (KeyError, ValueError, SystemExit):
+                return self._send_message(400, "Invalid time range, from and to must be epoch seconds, from < to")
+            rows = self.service.rows(profile, from_date=from_date, to=to)
+        else:
+            return self._send_message(400, "Either uuids or from/to must be given")
+
+        self.send_response(200)
+        if output_format == "csv":
+            # The header is the union of all the fields, so rows must be normalized before writing
+            rows = list(rows)
+            self.send_header("Content-Type", "text/csv")
+            self.end_headers()
+            encoder = CSVEncoder(sorted(set().union(*rows)))
+            self.wfile.write(encoder.header().encode("utf-8"))
+            for row in rows:
+                self.wfile.write(encoder.encode_row(row).encode("utf-8"))
+        else:
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for row in rows:
+                self.wfile.write(json.dumps(row, default=str).encode("utf-8") + b"\n")
+
+    def _send_message(self, code: int, message: str):
+        body = json.dumps({"message": message}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(argv: List[str] = None) -> int:
+    """Entry point of the serve command."""
+    parser = argparse.ArgumentParser(prog="data_collector serve", description=__doc__)
+    parser.add_argument("--log-level",
+                        type=str,
+                        choices=VALID_LOG_LEVELS,
+                        default=os.environ.get("LOG_LEVEL", "INFO").upper(),
+                        help="Logging level (e.g., DEBUG, INFO, WARNING, ERROR, CRITICAL). Can also be set via LOG_LEVEL env var"
+    )
+    parser.add_argument("--es-server", action="store", nargs="+", help="ES Server endpoints, overrides the configured sources")
+    parser.add_argument("--es-index", action="store", nargs="+", help="ES Index names, queried on every ES server")
+    parser.add_argument("--config", action="store", nargs="+", help="Configuration files, served as profiles named after the file", required=True)
+    parser.add_argument("--instance-dict", action="store", help="Instance dictionary file")
+    parser.add_argument("--host", action="store", help="Address to listen on", default="127.0.0.1")
+    parser.add_argument("--port", action="store", help="Port to listen on", type=int, default=8080)
+    parser.add_argument("--cache-size", action="store", help="Maximum number of normalized runs kept in memory", type=int, default=10000)
+    parser.add_argument(
+        "--low-level",
+        action="store_true",
+        help="Query OpenSearch with the low-level client, working on raw documents instead of opensearch-dsl hits",
+    )
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level)
+    profiles = load_profiles(args.config)
+    try:
+        sources = resolve_sources(args.es_server, args.es_index, merge_profiles(profiles))
+    except ValueError as e:
+        parser.error(str(e))
+    instance_mapper = InstanceMapper(args.instance_dict) if args.instance_dict else None
+    RequestHandler.service = DataCollectorService(sources, profiles, instance_mapper, args.low_level, args.cache_size)
+    server = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+    logger.info(f"Serving profiles {', '.join(RequestHandler.service.profiles)} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
@@ -0,0 +1,203 @@
+"""
+Federated collection across several OpenSearch clusters and indices.
+"""
+
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Set
+from data_collector.collector import Collector, get_client
+from data_collector.instance_mapper import InstanceMapper
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the stop event while the queue is full
+QUEUE_POLL_INTERVAL = 0.5
+
+
+def build_collectors(sources: List[Dict[str, str]], config: dict, instance_mapper: InstanceMapper = None,
+                     low_level: bool = False) -> List[Collector]:
+    """
+    Builds a collector for every source, sources sharing the same ES server share a single client.
+
+    Args:
+        sources (list): Sources as returned by resolve_sources.
+        config (dict): Parsed configuration.
+        instance_mapper (InstanceMapper): Optional instance mapper.
+        low_level (bool): Whether to use the low-level collection mode.
+
+    Returns:
+        List of collectors, in the same order as the sources.
+    """
+    clients = {}
+    collectors = []
+    for source in sources:
+        if source["es_server"] not in clients:
+            clients[source["es_server"]] = get_client(source["es_server"], low_level)
+        collectors.append(Collector(source["es_server"], source["es_index"], config, instance_mapper,
+                                    low_level=low_level, os_client=clients[source["es_server"]]))
+    return collectors
+
+
+def collect_sources(sources: List[Dict[str, str]], config: dict, from_date: datetime, to: datetime,
+                    instance_mapper: InstanceMapper = None, low_level: bool = False,
+                    select: Callable[[List[str]], List[str]] = None) -> Iterator[dict]:
+    """
+    Collects runs from all the sources concurrently, merging them into a single stream deduplicated by UUID.
+
+    Sources sharing the same ES server share a single client. When a UUID is found in several sources,
+    the run of the first source in the list is kept.
+
+    Args:
+        sources (list): Sources as returned by resolve_sources.
+        config (dict): Parsed configuration.
+        from_date (datetime): Start of the time range.
+        to (datetime): End of the time range.
+        instance_mapper (InstanceMapper): Optional instance mapper.
+        low_level (bool): Whether to use the low-level collection mode.
+        select (callable): Optional filter of the listed UUIDs, see stream_runs.
+
+    Yields:
+        Runs, in the same format as Collector.collect.
+    """
+    collectors = build_collectors(sources, config, instance_mapper, low_level)
+    yield from stream_runs(sources, collectors, from_date, to, select=select)
+
+
+def stream_runs(sources: List[Dict[str, str]], collectors: List[Collector], from_date: datetime = None,
+                to: datetime = None, uuids: List[str] = None,
+                select: Callable[[List[str]], List[str]] = None) -> Iterator[dict]:
+    """
+    Runs the given collectors concurrently, merging their runs into a single stream deduplicated by UUID.
+
+    Every collector lists the UUIDs of its job summaries before collecting their metrics. When a UUID is
+    found in several sources the run of the first source in the list is kept, runs that a previous source
+    may still collect being held back until it's done, so the output doesn't depend on the sources timing.
+
+    Args:
+        sources (list): Sources of the collectors, used for reporting.
+        collectors (list): Collectors as returned by build_collectors.
+        from_date (datetime): Start of the time range.
+        to (datetime): End of the time range.
+        uuids (list): Optional list of UUIDs to restrict the collection to.
+        select (callable): Optional filter called with the UUIDs listed by all the sources, in source order,
+            returning the ones to collect. Their job summaries are reused, not fetched again.
+
+    Yields:
+        Runs, in the same format as Collector.collect.
+    """
+    # Bounded, so that collectors don't get too far ahead of the consumer
+    results = queue.Queue(maxsize=2 * len(collectors))
+    listed = threading.Event()
+    selected = set()
+    # Set when the consumer is gone, closed by the caller or failed, so that producers stop
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=QUEUE_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(idx, collector_instance):
+        try:
+            runs_metadata = collector_instance.job_summaries(from_date, to, uuids)
+            if not put((idx, "uuids", [uuid for uuid, profiles_metadata in runs_metadata.items() if profiles_metadata])):
+                return
+            listed.wait()
+            if stop.is_set():
+                return
+            if select:
+                runs_metadata = {uuid: metadata for uuid, metadata in runs_metadata.items() if uuid in selected}
+            runs = collector_instance.iter_collect(runs_metadata=runs_metadata)
+            try:
+                for run_data in runs:
+                    if not put((idx, "run", run_data)):
+                        return
+            finally:
+                runs.close()
+        except Exception as e:
+            put((idx, "error", e))
+        finally:
+            put((idx, "done", None))
+
+    start_time = time.time()
+    for idx, collector_instance in enumerate(collectors):
+        threading.Thread(target=produce, args=(idx, collector_instance), daemon=True).start()
+    try:
+        yield from _merge_runs(sources, results, listed, selected, select, start_time)
+    finally:
+        stop.set()
+        listed.set()
+
+
+def _merge_runs(sources: List[Dict[str, str]], results: queue.Queue, listed: threading.Event, selected: Set[str],
+                select: Callable[[List[str]], List[str]], start_time: float) -> Iterator[dict]:
+    """Consumes the messages of the producers of stream_runs, yielding the deduplicated runs"""
+    listings = [None] * len(sources)
+    pending = len(sources)
+    while pending:
+        idx, kind, payload = results.get()
+        if kind == "error":
+            raise payload
+        pending -= 1
+        listings[idx] = payload
+    # Sources listing every UUID, in source order
+    owners = {}
+    for idx, listing in enumerate(listings):
+        for uuid in listing:
+            owners.setdefault(uuid, []).append(idx)
+    if select:
+        selected.update(select(list(owners)))
+        owners = {uuid: indices for uuid, indices in owners.items() if uuid in selected}
+    listed.set()
+
+    def first_run(uuid):
+        # Source of the run to keep, None while a previous source may still collect it
+        for idx in owners[uuid]:
+            if idx in held[uuid]:
+                return idx
+            if idx not in done:
+                return None
+
+    stats = [{"runs": 0, "duplicates": 0, "elapsed": 0.0} for _ in sources]
+    held = {}
+    done = set()
+    emitted = set()
+    pending = len(sources)
+    while pending:
+        idx, kind, run_data = results.get()
+        if kind == "error":
+            raise run_data
+        if kind == "done":
+            pending -= 1
+            done.add(idx)
+            stats[idx]["elapsed"] = time.time() - start_time
+            ready = [uuid for uuid in held if idx in owners[uuid]]
+        else:
+            stats[idx]["runs"] += 1
+            uuid = next(iter(run_data))
+            if uuid in emitted:
+                stats[idx]["duplicates"] += 1
+                continue
+            held.setdefault(uuid, {})[idx] = run_data
+            ready = [uuid]
+        for uuid in ready:
+            winner = first_run(uuid)
+            if winner is None:
+                continue
+            runs = held.pop(uuid)
+            for other in runs:
+                if other != winner:
+                    stats[other]["duplicates"] += 1
+            emitted.add(uuid)
+            yield runs[winner]
+
+    for idx, source in enumerate(sources):
+        logger.info(f"Source {source['es_server']} [{source['es_index']}]: {stats[idx]['runs']} runs "
+                    f"in {stats[idx]['elapsed']:.2f} seconds, {stats[idx]['duplicates']} duplicated UUIDs dropped")
@@ -0,0 +1,89 @@
+"""
+Memory-budgeted row storage, spilling rows to temporary JSON-lines segments.
+"""
+
+import os
+import sys
+import json
+import logging
+import tempfile
+from typing import Any, Dict, Hashable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+
+def row_size(row: Dict[str, Any]) -> int:
+    """Returns a rough estimate of the memory used by a row, in bytes"""
+    return sys.getsizeof(row) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in row.items())
+
+
+class RowStore:
+    """Stores rows grouped by key, spilling them to disk when the memory budget is exceeded."""
+
+    def __init__(self, max_memory: int = None):
+        """
+        Init method for instance variables
+
+        Args:
+            max_memory: Memory budget for in-memory rows, in bytes. Rows are never spilled when not set.
+        """
+        self.max_memory = max_memory
+        self.memory = 0
+        self._rows = {}
+        self._counts = {}
+        self._fieldnames = {}
+        self._segments = {}
+        self._tmpdir = None
+
+    def add(self, key: Hashable, row: Dict[str, Any]) -> None:
+        """Adds a row to the given group"""
+        self._rows.setdefault(key, []).append(row)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._fieldnames.setdefault(key, set()).update(row)
+        if self.max_memory is not None:
+            self.memory += row_size(row)
+            if self.memory > self.max_memory:
+                self.spill()
+
+    def spill(self) -> None:
+        """Writes every in-memory row to the segment of its group"""
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="data_collector_")
+        spilled = 0
+        for key, rows in self._rows.items():
+            if key not in self._segments:
+                self._segments[key] = os.path.join(self._tmpdir.name, f"segment_{len(self._segments)}.jsonl")
+            with open(self._segments[key], "a") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str))
+                    f.write("\n")
+            spilled += len(rows)
+        logger.debug(f"Spilled {spilled} rows ({self.memory} bytes) to {self._tmpdir.name}")
+        self._rows = {}
+        self.memory = 0
+
+    def keys(self) -> List[Hashable]:
+        """Returns the groups, in insertion order"""
+        return list(self._counts)
+
+    def count(self, key: Hashable) -> int:
+        """Returns the number of rows of a group"""
+        return self._counts.get(key, 0)
+
+    def fieldnames(self, key: Hashable) -> List[str]:
+        """Returns the sorted union of the fields of every row of a group"""
+        return sorted(self._fieldnames.get(key, set()))
+
+    def rows(self, key: Hashable) -> Iterator[Dict[str, Any]]:
+        """Yields the rows of a group in insertion order, spilled rows first"""
+        if key in self._segments:
+            with open(self._segments[key]) as f:
+                for line in f:
+                    yield json.loads(line)
+        yield from self._rows.get(key, [])
+
+    def close(self) -> None:
+        """Removes the spilled segments"""
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
@@ -1,7 +1,10 @@
 import re
 import logging
+from urllib.parse import quote, unquote
 from datetime import datetime
-from typing import Dict, List, Any
+from itertools import islice
+from typing import Dict, Iterable, List, Tuple, Any
+from data_collector.constants import HIVE_DEFAULT_PARTITION
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +13,41 @@ def split_list_into_chunks(lst, chunk_size):
     for idx in range(0, len(lst), chunk_size):
         yield lst[idx:idx + chunk_size]
 
+def split_iterable_into_chunks(iterable: Iterable, chunk_size: int):
+    """Splits an iterable into lists of given chunk sizes"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+def partition_row(row: Dict, partition_by: List[str]) -> Tuple[str, Dict]:
+    """Returns the hive-style key=value/ partition path of a row, and the row without the partition keys"""
+    if not partition_by:
+        return "", row
+    path = "/".join(f"{key}={partition_value(row.get(key))}" for key in partition_by)
+    return path, {k: v for k, v in row.items() if k not in partition_by}
+
+def partition_value(value: Any) -> str:
+    """Returns the escaped representation of a partition value"""
+    if value is None or value == "":
+        return HIVE_DEFAULT_PARTITION
+    return quote(str(value), safe="")
+
+def partition_values(path: str) -> Dict[str, Any]:
+    """Returns the partition values of a hive-style partition path, None for the default partition"""
+    values = {}
+    for part in path.split("/") if path else []:
+        key, value = part.split("=", 1)
+        values[key] = None if value == HIVE_DEFAULT_PARTITION else unquote(value)
+    return values
+
+def parse_size(size: str) -> int:
+    """Parses a human readable size, like 512M or 4G, into bytes"""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    size = str(size).strip().upper().removesuffix("B").removesuffix("I")
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
 def strhash(value: Any) -> str:
     """Recursively generate a stable string hash from a nested dict or value"""
     if isinstance(value, dict):
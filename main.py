@@ -5,21 +5,85 @@ import re
 import sys
 import logging
 import argparse
-import urllib3
-from data_collector import __version__, collector
-from data_collector.config import Config
-from data_collector.normalize import normalize
-from data_collector import output
-from data_collector.utils import split_list_into_chunks, parse_timerange
+import functools
+from data_collector import __version__
+from data_collector import registry
+from data_collector.config import resolve_sources
+from data_collector.profiles import load_profiles, merge_profiles, normalize_run
+from data_collector.cache import RowCache, config_hash
+from data_collector.csv_encoder import COMPRESSIONS
+from data_collector.spill import RowStore
+from data_collector.utils import split_iterable_into_chunks, parse_timerange, parse_size, partition_row, partition_values
 from data_collector.constants import VALID_LOG_LEVELS
 from data_collector.logging import configure_logging
 import datetime
 from data_collector.instance_mapper import InstanceMapper
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def export_rows(store: RowStore, profile: dict, output: str, from_date: datetime.datetime, to: datetime.datetime):
+    """Writes the normalized rows of a profile as CSV chunks, split by partition when partition_by is set"""
+    write_chunk = registry.load(registry.SINKS, output)
+    partition_by = profile.get("partition_by", [])
+    compression = profile.get("compression")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Invalid compression '{compression}', valid values are: gzip, zstd")
+    time_range = f"{from_date.strftime('%Y-%m-%dT%H:%M:%SZ')}_{to.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+    manifest = {"partition_by": partition_by, "partitions": []}
+    for key in store.keys():
+        name, path = key
+        if name != profile["name"]:
+            continue
+        fieldnames = store.fieldnames(key)
+        files = []
+        for idx, chunk in enumerate(split_iterable_into_chunks(store.rows(key), profile["chunk_size"]), start=1):
+            filename = f"{profile['output_prefix']}_{time_range}_chunk_{idx}{COMPRESSIONS[compression]}"
+            # Partition files are relative to the output folder, where the manifest is written
+            relative_filename = f"{path}/{filename}" if path else filename
+            if output == "s3":
+                folder = f"{profile['s3_folder'].rstrip('/')}/{path}" if path else profile["s3_folder"]
+                write_chunk(chunk, fieldnames, profile["s3_bucket"], folder, filename, compression=compression)
+            else:
+                write_chunk(chunk, fieldnames, relative_filename, compression=compression)
+            files.append(relative_filename)
+        manifest["partitions"].append({
+            "path": path,
+            "values": partition_values(path),
+            "rows": store.count(key),
+            "files": files,
+            "columns": fieldnames,
+        })
+
+    if partition_by:
+        write_manifest = registry.load(registry.MANIFEST_SINKS, output)
+        filename = f"{profile['output_prefix']}_{time_range}_manifest.json"
+        if output == "s3":
+            write_manifest(manifest, profile["s3_bucket"], profile["s3_folder"], filename)
+        else:
+            write_manifest(manifest, filename)
+
+
+def add_cached_rows(row_cache: RowCache, cache_keys: dict, store: RowStore, profiles: list, uuids: list) -> list:
+    """Adds the cached rows of the listed runs to the store, returning the UUIDs of the runs left to collect"""
+    logger = logging.getLogger(__name__)
+    missing = []
+    for uuid in uuids:
+        cached_rows = {profile["name"]: row_cache.get(uuid, cache_keys[profile["name"]]) for profile in profiles}
+        if any(row is None for row in cached_rows.values()):
+            missing.append(uuid)
+            continue
+        for profile in profiles:
+            if cached_rows[profile["name"]]:
+                path, row = partition_row(cached_rows[profile["name"]], profile.get("partition_by", []))
+                store.add((profile["name"], path), row)
+    logger.info(f"{len(uuids) - len(missing)} runs served from the row cache, {len(missing)} runs to collect")
+    return missing
+
 
 def main():
     """Console script for data_collector."""
+    if sys.argv[1:2] == ["serve"]:
+        from data_collector import server
+        return server.main(sys.argv[2:])
     parser = argparse.ArgumentParser()
     parser.add_argument("--version", action="version", version=__version__)
     parser.add_argument("--log-level", 
@@ -28,9 +92,9 @@ def main():
                         default=os.environ.get("LOG_LEVEL", "INFO").upper(), 
                         help="Logging level (e.g., DEBUG, INFO, WARNING, ERROR, CRITICAL). Can also be set via LOG_LEVEL env var"
     )
-    parser.add_argument("--es-server", action="store", help="ES Server endpoint", required=True)
-    parser.add_argument("--es-index", action="store", help="ES Index name", required=True)
-    parser.add_argument("--config", action="store", help="Configuration file")
+    parser.add_argument("--es-server", action="store", nargs="+", help="ES Server endpoints, overrides the configured sources")
+    parser.add_argument("--es-index", action="store", nargs="+", help="ES Index names, queried on every ES server")
+    parser.add_argument("--config", action="store", nargs="+", help="Configuration files, all of them served by a single collection pass", required=True)
     parser.add_argument("--instance-dict", action="store", help="Instance dictionary file")
     parser.add_argument(
         "--from",
@@ -51,46 +115,78 @@ def main():
         "--output",
         action="store",
         help="Output type",
-        choices=["s3", "file"],
+        choices=list(registry.SINKS),
         type=str,
         default="s3",
     )
+    parser.add_argument(
+        "--low-level",
+        action="store_true",
+        help="Query OpenSearch with the low-level client, working on raw documents instead of opensearch-dsl hits",
+    )
+    parser.add_argument(
+        "--max-memory",
+        action="store",
+        help="Memory budget for normalized rows (e.g. 512M, 2G), rows above it are spilled to temporary files",
+        type=parse_size,
+    )
+    parser.add_argument(
+        "--cache",
+        action="store",
+        help="SQLite file caching normalized rows, only new or invalidated runs are collected and normalized",
+    )
     args = parser.parse_args()
     configure_logging(args.log_level)
     logger = logging.getLogger(__name__)
     logger.info(f"CLI args: {args}")
     from_date, to = parse_timerange(args.from_date, args.to)
-    normalized_rows = []
-    config = Config(args.config)
-    logger.debug(f"Processing input configuration: {config}")
-    input_config = config.parse()
+    profiles = load_profiles(args.config)
+    logger.debug(f"Processing input configuration: {args.config}")
+    input_config = merge_profiles(profiles)
+    try:
+        sources = resolve_sources(args.es_server, args.es_index, input_config)
+    except ValueError as e:
+        parser.error(str(e))
     if args.instance_dict:
         logger.info(f"Instance dictionary file provided: {args.instance_dict}")
         instance_mapper = InstanceMapper(args.instance_dict)
     else:
         logger.warning("No instance dictionary file provided, hardware specs won't be populated")
         instance_mapper = None
-    collector_instance = collector.Collector(args.es_server, args.es_index, input_config, instance_mapper)
-    data = collector_instance.collect(from_date, to)
-    for each_run in data:
-        for _, run_json in each_run.items():
-            normalized_json = normalize(run_json,
-                                        input_config.get('target_filters_by_data', []),
-                                        input_config.get("target_field_extract_filters", []),
-                                        input_config.get("target_fields_to_reduce", []),
-                                        ",".join(input_config["exclude_normalization"]))
-            if normalized_json:
-                normalized_rows.append(normalized_json)
+    store = RowStore(args.max_memory)
+    row_cache = RowCache(args.cache) if args.cache else None
+    try:
+        select = None
+        if row_cache:
+            # Cached runs are dropped once listed, only the uncached ones are collected
+            cache_keys = {profile["name"]: config_hash(profile, args.instance_dict) for profile in profiles}
+            select = functools.partial(add_cached_rows, row_cache, cache_keys, store, profiles)
+        collect_sources = registry.load(registry.COLLECTORS, "opensearch")
+        data = collect_sources(sources, input_config, from_date, to, instance_mapper, low_level=args.low_level,
+                               select=select)
+        for each_run in data:
+            for uuid, run_json in each_run.items():
+                for profile in profiles:
+                    normalized_json = {}
+                    if profile["name"] in run_json["profiles"]:
+                        normalized_json = normalize_run(run_json, profile)
+                    # Runs missing metrics of the profile are checked again by the next exports
+                    if row_cache and profile["name"] not in run_json.get("incompleteProfiles", []):
+                        row_cache.put(uuid, cache_keys[profile["name"]], normalized_json)
+                    if normalized_json:
+                        path, row = partition_row(normalized_json, profile.get("partition_by", []))
+                        store.add((profile["name"], path), row)
 
-    # Write to CSV
-    if normalized_rows:
-        fieldnames = sorted(set().union(*normalized_rows))
-        for idx, chunk in enumerate(split_list_into_chunks(normalized_rows, input_config["chunk_size"]), start=1):
-            filename = f"{input_config['output_prefix']}_{from_date.strftime('%Y-%m-%dT%H:%M:%SZ')}_{to.strftime('%Y-%m-%dT%H:%M:%SZ')}_chunk_{idx}.csv"
-            if args.output == "s3":
-                output.upload_csv_to_s3(chunk, fieldnames, input_config["s3_bucket"], input_config["s3_folder"], filename)
-            else:
-                output.write_to_file(chunk, fieldnames, filename)
+        # Write to CSV
+        for profile in profiles:
+            rows = sum(store.count(key) for key in store.keys() if key[0] == profile["name"])
+            logger.info(f"Profile {profile['name']}: {rows} rows")
+            if rows:
+                export_rows(store, profile, args.output, from_date, to)
+    finally:
+        store.close()
+        if row_cache:
+            row_cache.close()
     return 0
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+"""Tests for the collector, against the stub OpenSearch endpoint of the service tests."""
+
+import unittest
+
+from data_collector.collector import Collector
+from tests.test_server import FakeOpenSearch, make_config, start_server
+
+
+class TestCollector(unittest.TestCase):
+    """Tests for Collector.collect, with both the opensearch-dsl and the low-level paths."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.opensearch, cls.opensearch_url = start_server(FakeOpenSearch)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.opensearch.shutdown()
+        cls.opensearch.server_close()
+
+    def collect(self, metrics):
+        runs = {}
+        for low_level in (False, True):
+            collector = Collector(self.opensearch_url, "kube-burner", make_config(metrics), low_level=low_level)
+            runs[low_level] = {uuid: run for run_data in collector.collect(None, None) for uuid, run in run_data.items()}
+        self.assertEqual(runs[False], runs[True])
+        return runs[False]
+
+    def test_complete_runs(self):
+        runs = self.collect(["alert", "cpu-masters"])
+        self.assertEqual(sorted(runs), ["uuid-0", "uuid-1", "uuid-2"])
+        # Garbage collection datapoints are left out
+        self.assertEqual(len(runs["uuid-0"]["metrics"]["cpu-masters"]), 2)
+        # Alerts are excluded from normalization, only their severities are fetched
+        self.assertEqual(runs["uuid-0"]["alertSeverities"], {"warning": 1})
+        self.assertNotIn("alert", runs["uuid-0"]["metrics"])
+
+    def test_no_metrics(self):
+        runs = self.collect([])
+        self.assertEqual(sorted(runs), ["uuid-0", "uuid-1", "uuid-2", "uuid-3"])
+        self.assertEqual(runs["uuid-3"], {"metadata": {"platform": "AWS", "passed": True, "ocpMajorVersion": "4.19",
+                                                       "jobConfig": {"name": "cluster-density-v2"}},
+                                          "metrics": {}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Tests for the CSV encoder, checking that its output is byte-identical to csv.DictWriter."""
+
+import io
+import csv
+import gzip
+import os
+import random
+import tempfile
+import unittest
+
+from data_collector.csv_encoder import CSVEncoder, open_csv
+
+# Values exercising the quoting and formatting rules of the csv module
+GOLDEN_VALUES = [None, "", 0, -1, 10 ** 20, 0.1, 1e-300, 1e22, float("nan"), float("inf"), True, False,
+                 "Green", 'a"b', "a,b", "a\nb", "a\rb", " spaced ", "é", "#", "\t", [1, 2], {"a": 1}]
+
+
+def dict_writer(fieldnames, rows) -> str:
+    buffer = io.StringIO(newline="")
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def csv_encoder(fieldnames, rows, batch_size=1000) -> str:
+    buffer = io.StringIO(newline="")
+    CSVEncoder(fieldnames, batch_size).write(buffer, rows)
+    return buffer.getvalue()
+
+
+class TestCSVEncoder(unittest.TestCase):
+    """Golden tests of CSVEncoder against csv.DictWriter."""
+
+    def test_golden_values(self):
+        for value in GOLDEN_VALUES:
+            for fieldnames, rows in ((["a"], [{"a": value}, {}]), (["a", "b,c", 'd"'], [{"b,c": value}, {"a": value}])):
+                with self.subTest(value=value, fieldnames=fieldnames):
+                    self.assertEqual(csv_encoder(fieldnames, rows), dict_writer(fieldnames, rows))
+
+    def test_sparse_rows(self):
+        random.seed(0)
+        fieldnames = sorted(f"metric-{idx}_byLabelNamespace_ns-{idx % 7}" for idx in range(50))
+        rows = [{name: random.random() * 1000 if random.random() < 0.9 else random.choice(GOLDEN_VALUES)
+                 for name in fieldnames if random.random() < 0.5} for _ in range(500)]
+        # A small batch size exercises the flushes in the middle of the rows
+        self.assertEqual(csv_encoder(fieldnames, rows, batch_size=7), dict_writer(fieldnames, rows))
+
+    def test_unknown_field(self):
+        with self.assertRaisesRegex(ValueError, "dict contains fields not in fieldnames: 'b'"):
+            CSVEncoder(["a"]).encode_row({"a": 1, "b": 2})
+
+    def test_gzip(self):
+        rows = [{"a": value} for value in GOLDEN_VALUES]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "rows.csv.gz")
+            with open_csv(filename, "gzip") as f:
+                CSVEncoder(["a"]).write(f, rows)
+            with gzip.open(filename, "rt", newline="") as f:
+                self.assertEqual(f.read(), dict_writer(["a"], rows))
+
+    def test_invalid_compression(self):
+        with self.assertRaisesRegex(ValueError, "Invalid compression 'lz4'"):
+            open_csv("rows.csv", "lz4")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests for the multi-profile support."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import yaml
+
+from data_collector.profiles import load_profiles, route_run
+
+
+class TestLoadProfiles(unittest.TestCase):
+    """Tests for load_profiles."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_config(self, name, config):
+        config_file = os.path.join(self.tmpdir, f"{name}.yml")
+        with open(config_file, "w") as f:
+            yaml.safe_dump(config, f)
+        return config_file
+
+    def test_names(self):
+        first = self.write_config("metrics", {"output_prefix": "a"})
+        profiles = load_profiles([first, first, self.write_config("other", {"output_prefix": "b"})])
+        self.assertEqual([profile["name"] for profile in profiles], ["metrics", "metrics-1", "other"])
+
+    def test_output_prefix_collisions(self):
+        profiles = load_profiles([
+            self.write_config("cluster-density", {"output_prefix": "output", "s3_folder": "cluster-density"}),
+            self.write_config("node-density", {"output_prefix": "output", "s3_folder": "node-density"}),
+            self.write_config("udn-density", {"output_prefix": "udn"}),
+            self.write_config("serve-only", {}),
+        ])
+        self.assertEqual([profile.get("output_prefix") for profile in profiles],
+                         ["output_cluster-density", "output_node-density", "udn", None])
+
+
+
+class TestRouteRun(unittest.TestCase):
+    """Tests for route_run."""
+
+    run_json = {
+        "metrics": {"cpu-masters": [{"metricName": "cpu-masters", "value": 1.0}]},
+        "profiles": {"alerts": {"passed": True}, "cpu": {"passed": False}},
+        "alertSeverities": {"warning": 2},
+    }
+
+    def test_metrics(self):
+        routed = route_run(self.run_json, {"name": "cpu", "metrics": ["cpu-masters", "cpu-workers"]})
+        self.assertEqual(routed["metadata"], {"passed": False})
+        self.assertEqual(routed["metrics"], self.run_json["metrics"])
+        # Normalization mutates the datapoints, they must not be shared across profiles
+        self.assertIsNot(routed["metrics"]["cpu-masters"][0], self.run_json["metrics"]["cpu-masters"][0])
+
+    def test_alert_severities(self):
+        routed = route_run(self.run_json, {"name": "alerts", "metrics": ["alert"]})
+        self.assertEqual(routed["alertSeverities"], {"warning": 2})
+        routed = route_run(self.run_json, {"name": "cpu", "metrics": ["cpu-masters"]})
+        self.assertNotIn("alertSeverities", routed)
+
+
+if __name__ == "__main__":
+    unittest.main()
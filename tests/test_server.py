@@ -0,0 +1,304 @@
+"""Tests for the HTTP service mode, backed by a stub OpenSearch endpoint."""
+
+import io
+import os
+import csv
+import json
+import gzip
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml
+
+from data_collector.profiles import load_profiles
+from data_collector.server import DataCollectorService, RequestHandler
+
+FROM_DATE, TO = 1735689600, 1738368000  # January 2025
+
+
+def make_docs():
+    """Builds the documents of three complete runs and an incomplete one, missing the cpu-masters metric"""
+    docs = []
+    for idx, severity in enumerate(["warning", "info", "error", "info"]):
+        uuid = f"uuid-{idx}"
+        timestamp = f"2025-01-0{idx + 1}T00:00:00Z"
+        docs.append({"uuid": uuid, "metricName": "jobSummary", "timestamp": timestamp, "platform": "AWS",
+                     "passed": True, "ocpMajorVersion": "4.19", "jobConfig": {"name": "cluster-density-v2"}})
+        if idx != 3:
+            for namespace in ["ns-0", "ns-1"]:
+                docs.append({"uuid": uuid, "metricName": "cpu-masters", "timestamp": timestamp, "value": 10.0 + idx,
+                             "labels": {"namespace": namespace}, "jobName": "cluster-density-v2", "query": "q"})
+        docs.append({"uuid": uuid, "metricName": "alert", "timestamp": timestamp, "severity": severity})
+        docs.append({"uuid": uuid, "metricName": "cpu-masters", "timestamp": timestamp, "value": 0.0,
+                     "jobConfig": {"name": "garbage-collection"}})
+    return docs
+
+
+def field(doc, name):
+    value = doc
+    for part in name.removesuffix(".keyword").split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def listify(value):
+    return value if isinstance(value, list) else [value]
+
+
+def matches(doc, query):
+    """Evaluates the subset of the query DSL used by the collector"""
+    (kind, body), = query.items()
+    if kind == "match_all":
+        return True
+    if kind == "term":
+        (name, value), = body.items()
+        return field(doc, name) == (value["value"] if isinstance(value, dict) else value)
+    if kind == "terms":
+        (name, values), = body.items()
+        return field(doc, name) in values
+    if kind == "range":
+        (name, bounds), = body.items()
+        value = field(doc, name)
+        return value is not None and bounds.get("gte", value) <= value <= bounds.get("lte", value)
+    if kind == "bool":
+        must = listify(body.get("must", [])) + listify(body.get("filter", []))
+        should = listify(body.get("should", []))
+        minimum_should_match = body.get("minimum_should_match", 0 if must else min(len(should), 1))
+        return (all(matches(doc, q) for q in must)
+                and not any(matches(doc, q) for q in listify(body.get("must_not", [])))
+                and sum(matches(doc, q) for q in should) >= minimum_should_match)
+    raise ValueError(f"Unsupported query {kind}")
+
+
+def aggregate(docs, aggs):
+    """Evaluates terms and filter aggregations"""
+    result = {}
+    for name, agg in aggs.items():
+        sub_aggs = agg.get("aggs", {})
+        if "filter" in agg:
+            matching = [doc for doc in docs if matches(doc, agg["filter"])]
+            result[name] = dict(aggregate(matching, sub_aggs), doc_count=len(matching))
+            continue
+        terms = agg["terms"]
+        if terms.get("size", 10) < 1:
+            raise ValueError(f"[size] must be greater than 0. Found [{terms['size']}] in [{name}]")
+        groups = {}
+        for doc in docs:
+            value = field(doc, terms["field"])
+            if value is not None and value in terms.get("include", [value]):
+                groups.setdefault(value, []).append(doc)
+        buckets = sorted(groups.items(), key=lambda group: -len(group[1]))[:terms.get("size", 10)]
+        result[name] = {"buckets": [dict(aggregate(group, sub_aggs), key=key, doc_count=len(group))
+                                    for key, group in buckets]}
+    return result
+
+
+class FakeOpenSearch(BaseHTTPRequestHandler):
+    """Stub OpenSearch answering the search, scroll and aggregation requests of the collector."""
+
+    docs = make_docs()
+    requests = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        type(self).requests += 1
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        body = json.loads(body) if body else {}
+        if self.path.startswith("/_search/scroll"):
+            # Searches return all their hits in the first page
+            return self._send({"_scroll_id": "scroll", "_shards": {"total": 1, "successful": 1, "skipped": 0},
+                               "hits": {"hits": []}})
+        docs = [doc for doc in self.docs if matches(doc, body.get("query", {"match_all": {}}))]
+        docs.sort(key=lambda doc: doc["timestamp"])
+        hits = [{"_index": "kube-burner", "_id": str(idx), "_source": doc, "sort": [doc["timestamp"], idx]}
+                for idx, doc in enumerate(docs)]
+        if "search_after" in body:
+            hits = [hit for hit in hits if hit["sort"] > body["search_after"]]
+        if "scroll" not in self.path:
+            hits = hits[:body.get("size", 10)]
+        response = {"took": 1, "timed_out": False, "_scroll_id": "scroll",
+                    "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+                    "hits": {"total": {"value": len(hits), "relation": "eq"}, "hits": hits}}
+        if "aggs" in body:
+            try:
+                response["aggregations"] = aggregate(docs, body["aggs"])
+            except ValueError as e:
+                return self._send({"error": {"type": "illegal_argument_exception", "reason": str(e)}, "status": 400},
+                                  400)
+        self._send(response)
+
+    do_GET = do_POST
+    do_DELETE = do_POST
+
+    def _send(self, response, code=200):
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_server(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_config(metrics):
+    return {
+        "metadata": ["platform", "passed", "ocpMajorVersion", "name"],
+        "job_summary_filters": {"platform.keyword": "AWS"},
+        "metrics": metrics,
+        "exclude_normalization": ["alert"],
+        "target_filters_by_data": [{"platform": "AWS"}],
+    }
+
+
+class ServiceTestCase(unittest.TestCase):
+    """Starts the service, serving the configs profiles, against the stub OpenSearch."""
+
+    configs = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        config_files = []
+        for name, config in cls.configs.items():
+            config_files.append(os.path.join(cls.tmpdir, f"{name}.yml"))
+            with open(config_files[-1], "w") as f:
+                yaml.safe_dump(config, f)
+        cls.opensearch, opensearch_url = start_server(FakeOpenSearch)
+        sources = [{"es_server": opensearch_url, "es_index": "kube-burner"}]
+        # The handler class is shared, every test class serves its own service
+        cls.handler = type("Handler", (RequestHandler,), {})
+        cls.handler.service = DataCollectorService(sources, load_profiles(config_files))
+        cls.service, cls.service_url = start_server(cls.handler)
+
+    @classmethod
+    def tearDownClass(cls):
+        for server in (cls.service, cls.opensearch):
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(cls.tmpdir)
+
+    def get(self, path):
+        with urllib.request.urlopen(f"{self.service_url}{path}") as response:
+            return response.headers["Content-Type"], response.read().decode("utf-8")
+
+    def get_jsonl(self, path):
+        content_type, body = self.get(path)
+        self.assertEqual(content_type, "application/x-ndjson")
+        return {row["uuid"]: row for row in map(json.loads, body.splitlines())}
+
+    def get_csv(self, path):
+        content_type, body = self.get(path)
+        self.assertEqual(content_type, "text/csv")
+        return {row["uuid"]: row for row in csv.DictReader(io.StringIO(body, newline=""))}
+
+
+class TestService(ServiceTestCase):
+    """Tests for the /rows endpoint of the service."""
+
+    configs = {"metrics": make_config(["alert", "cpu-masters"])}
+
+    def test_health(self):
+        self.assertEqual(self.get("/health")[1], '{"message": "OK"}')
+
+    def test_rows_by_uuids_jsonl(self):
+        rows = self.get_jsonl("/rows?uuids=uuid-0,uuid-1,uuid-3")
+        self.assertEqual(set(rows), {"uuid-0", "uuid-1"})
+        self.assertEqual(rows["uuid-0"]["cluster_health_score"], "Yellow")
+        self.assertEqual(rows["uuid-1"]["cluster_health_score"], "Green")
+        self.assertEqual(rows["uuid-0"]["platform"], "AWS")
+        self.assertIn("cpu-masters_byLabelNamespace_ns-0", rows["uuid-0"])
+
+    def test_rows_by_uuids_csv(self):
+        rows = self.get_csv("/rows?uuids=uuid-1,uuid-2&config=metrics&format=csv")
+        self.assertEqual(set(rows), {"uuid-1", "uuid-2"})
+        self.assertEqual(rows["uuid-2"]["cluster_health_score"], "Red")
+        self.assertEqual(rows["uuid-1"]["platform"], "AWS")
+
+    def test_rows_by_time_range_jsonl(self):
+        rows = self.get_jsonl(f"/rows?from={FROM_DATE}&to={TO}")
+        self.assertEqual(set(rows), {"uuid-0", "uuid-1", "uuid-2"})
+
+    def test_rows_by_time_range_csv(self):
+        rows = self.get_csv(f"/rows?from={FROM_DATE}&to={TO}&format=csv")
+        self.assertEqual(set(rows), {"uuid-0", "uuid-1", "uuid-2"})
+        self.assertEqual([rows[uuid]["cluster_health_score"] for uuid in sorted(rows)], ["Yellow", "Green", "Red"])
+
+    def test_cached_rows(self):
+        path = "/rows?uuids=uuid-0,uuid-2"
+        first = self.get_jsonl(path)
+        requests = FakeOpenSearch.requests
+        self.assertEqual(self.get_jsonl(path), first)
+        self.assertEqual(FakeOpenSearch.requests, requests)
+
+    def test_invalid_requests(self):
+        for path, code in [("/rows", 400), ("/rows?uuids=uuid-0&format=xml", 400),
+                           ("/rows?uuids=uuid-0&config=unknown", 404), ("/unknown", 404)]:
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                self.get(path)
+            self.assertEqual(error.exception.code, code)
+
+
+class TestMultiProfileService(ServiceTestCase):
+    """Tests for a service serving several profiles, uuid-3 only being complete for the alerts one."""
+
+    configs = {"alerts": make_config(["alert"]), "cpu": make_config(["cpu-masters"])}
+
+    def test_rows_by_uuids_jsonl(self):
+        self.assertEqual(set(self.get_jsonl("/rows?uuids=uuid-0,uuid-3&config=alerts")), {"uuid-0", "uuid-3"})
+        self.assertEqual(set(self.get_jsonl("/rows?uuids=uuid-0,uuid-3&config=cpu")), {"uuid-0"})
+
+    def test_rows_by_uuids_csv(self):
+        self.assertEqual(set(self.get_csv("/rows?uuids=uuid-1,uuid-2&config=cpu&format=csv")), {"uuid-1", "uuid-2"})
+
+    def test_rows_by_time_range_jsonl(self):
+        rows = self.get_jsonl(f"/rows?from={FROM_DATE}&to={TO}&config=alerts")
+        self.assertEqual(set(rows), {"uuid-0", "uuid-1", "uuid-2", "uuid-3"})
+
+    def test_rows_by_time_range_csv(self):
+        rows = self.get_csv(f"/rows?from={FROM_DATE}&to={TO}&config=cpu&format=csv")
+        self.assertEqual(set(rows), {"uuid-0", "uuid-1", "uuid-2"})
+
+    def test_cluster_health(self):
+        # Only the profile collecting alerts gets their severities, as if every profile was served alone
+        alerts = self.get_jsonl(f"/rows?from={FROM_DATE}&to={TO}&config=alerts")
+        cpu = self.get_jsonl(f"/rows?from={FROM_DATE}&to={TO}&config=cpu")
+        self.assertEqual([alerts[uuid]["cluster_health_score"] for uuid in sorted(alerts)],
+                         ["Yellow", "Green", "Red", "Green"])
+        self.assertEqual([cpu[uuid]["cluster_health_score"] for uuid in sorted(cpu)], ["Green", "Green", "Green"])
+
+    def test_cached_rows(self):
+        self.get_jsonl("/rows?uuids=uuid-0,uuid-3&config=alerts")
+        requests = FakeOpenSearch.requests
+        # Both profiles are warmed up by the first request
+        self.assertEqual(set(self.get_jsonl("/rows?uuids=uuid-0,uuid-3&config=alerts")), {"uuid-0", "uuid-3"})
+        self.assertEqual(set(self.get_jsonl("/rows?uuids=uuid-0&config=cpu")), {"uuid-0"})
+        self.assertEqual(FakeOpenSearch.requests, requests)
+
+    def test_incomplete_runs_not_cached(self):
+        self.get_jsonl("/rows?uuids=uuid-3&config=alerts")
+        requests = FakeOpenSearch.requests
+        # uuid-3 misses the metrics of the cpu profile, they could still be indexed later
+        self.assertEqual(self.get_jsonl("/rows?uuids=uuid-3&config=cpu"), {})
+        self.assertGreater(FakeOpenSearch.requests, requests)
+        self.assertIsNone(self.handler.service.cache.get("cpu", "uuid-3"))
+        self.assertEqual(self.handler.service.cache.get("alerts", "uuid-3")["uuid"], "uuid-3")
+
+
+if __name__ == "__main__":
+    unittest.main()